@@ -1,11 +1,10 @@
 """A balanced incomplete block design with parameters (15, 3, 1)."""
 
-from collections import defaultdict
 from dataclasses import dataclass
-from itertools import combinations
+from functools import lru_cache
+from typing import Any
 from typing import Collection
-from typing import DefaultDict
-from typing import Tuple
+import numpy
 
 BIBD = Collection[Collection[str]]
 
@@ -46,20 +45,36 @@ bibd_8_4_3_str = """
 
 def str_to_blocks(bibd_str) -> BIBD:
     """Convert from compact string format to a list of blocks."""
-    return tuple(zip(*bibd_str.strip().split()))
+    lines = bibd_str.strip().split()
+    if not lines:
+        return ()
+    if len(set(len(line) for line in lines)) != 1:
+        raise ValueError(f"Rows have unequal lengths: {lines}")
 
+    return tuple(zip(*lines))
 
-bibd_8_4_3 = str_to_blocks(bibd_8_4_3_str)
-bibd_9_4_3 = str_to_blocks(bibd_9_4_3_str)
-bibd_15_3_1 = str_to_blocks(bibd_15_3_1_str)
-bibd_19_9_4 = str_to_blocks(bibd_19_9_4_str)
 
-ALL_BIBDS = [
-    bibd_8_4_3,
-    bibd_9_4_3,
-    bibd_15_3_1,
-    bibd_19_9_4,
-]
+BIBD_STRS = {
+    "bibd_8_4_3": bibd_8_4_3_str,
+    "bibd_9_4_3": bibd_9_4_3_str,
+    "bibd_15_3_1": bibd_15_3_1_str,
+    "bibd_19_9_4": bibd_19_9_4_str,
+}
+
+
+@lru_cache(maxsize=None)
+def get_bibd(name: str) -> BIBD:
+    """Return the named design from BIBD_STRS, parsing it on first use."""
+    return str_to_blocks(BIBD_STRS[name])
+
+
+def __getattr__(name: str) -> Any:
+    """Build the module-level designs (bibd_8_4_3, ALL_BIBDS, ...) lazily."""
+    if name in BIBD_STRS:
+        return get_bibd(name)
+    if name == "ALL_BIBDS":
+        return [get_bibd(bibd_name) for bibd_name in BIBD_STRS]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 @dataclass(frozen=True)
@@ -189,31 +204,67 @@ def is_bibd(bibd: BIBD) -> bool:
         print(f"Block sizes = {block_sizes}")
         return False
 
-    element_memberships: DefaultDict[str, int] = defaultdict(int)
-    pairwise_memberships: DefaultDict[Tuple[str, str], int] = defaultdict(int)
+    elements = sorted(set(x for block in bibd for x in block))
+    if not elements:
+        print("Blocks are empty")
+        return False
 
-    for block in bibd:
-        for element in block:
-            element_memberships[element] += 1
-        for elt1, elt2 in combinations(block, 2):
-            sorted_members = (elt1, elt2) if elt1 < elt2 else (elt2, elt1)
-            pairwise_memberships[sorted_members] += 1
+    element_index = {element: i for (i, element) in enumerate(elements)}
 
-    if len(set(element_memberships.values())) != 1:
-        print(f"Element memberships = {element_memberships}")
+    # Row i holds the sorted integer ids of the elements of block i.
+    blocks = numpy.sort(
+        numpy.array(
+            [[element_index[x] for x in block] for block in bibd],
+            dtype=numpy.int64,
+        ),
+        axis=1,
+    )
+
+    n = len(elements)
+    element_memberships = numpy.bincount(blocks.ravel(), minlength=n)
+    if numpy.ptp(element_memberships) != 0:
+        print(
+            "Element memberships = "
+            f"{dict(zip(elements, element_memberships.tolist()))}"
+        )
         return False
 
-    if len(set(pairwise_memberships.values())) != 1:
-        min_entry = min(pairwise_memberships.items(), key=lambda x: x[1])
-        max_entry = max(pairwise_memberships.items(), key=lambda x: x[1])
-        print(f"Pairwise memberships not all equal = {min_entry, max_entry}")
+    if n < 2:
+        print(f"Too few elements to form a pair: {elements}")
         return False
 
-    n = len(element_memberships.keys())
-    if len(pairwise_memberships.keys()) != n * (n - 1) / 2:
+    # Each element lies in r(k-1) pairs, split evenly among the other n-1
+    # elements, so lambda = r(k-1)/(n-1) must be an integer. This rejects
+    # many invalid designs without counting any pairs.
+    r, k = int(element_memberships[0]), blocks.shape[1]
+    if r * (k - 1) % (n - 1) != 0:
+        print(f"Pairs cannot be balanced: r(k-1) = {r * (k - 1)}, n-1 = {n - 1}")
+        return False
+
+    # Every pair of positions (i < j) within a block, giving element ids a < b.
+    first, second = numpy.triu_indices(blocks.shape[1], 1)
+    a, b = blocks[:, first].ravel(), blocks[:, second].ravel()
+    if (a == b).any():
+        print("A block contains a repeated element")
+        return False
+
+    # Index the pair (a, b) into a flat upper-triangular array of counters.
+    pair_ids = a * (2 * n - a - 1) // 2 + (b - a - 1)
+    pairwise_memberships = numpy.zeros(n * (n - 1) // 2, dtype=numpy.int64)
+    numpy.add.at(pairwise_memberships, pair_ids, 1)
+
+    num_represented = numpy.count_nonzero(pairwise_memberships)
+    if num_represented != n * (n - 1) / 2:
         print(
             "Not all pairs represented. Only found "
-            f"{len(pairwise_memberships.keys())} when expecting {n * (n-1) / 2}"
+            f"{num_represented} when expecting {n * (n-1) / 2}"
+        )
+        return False
+
+    if numpy.ptp(pairwise_memberships) != 0:
+        print(
+            "Pairwise memberships not all equal = "
+            f"{pairwise_memberships.min(), pairwise_memberships.max()}"
         )
         return False
 
@@ -221,6 +272,7 @@ def is_bibd(bibd: BIBD) -> bool:
 
 
 if __name__ == "__main__":
-    for bibd in ALL_BIBDS:
+    for name in BIBD_STRS:
+        bibd = get_bibd(name)
         print(f"Params = {BIBDParams.from_bibd(bibd)}")
         print(f"Blocks = {bibd}")
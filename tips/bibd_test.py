@@ -6,6 +6,7 @@ from bibd import BIBDParams
 from bibd import bibd_15_3_1
 from bibd import bibd_8_4_3
 from bibd import is_bibd
+from bibd import str_to_blocks
 
 
 @pytest.mark.parametrize("bibd", ALL_BIBDS)
@@ -24,6 +25,22 @@ def test_different_block_sizes_break_bibd():
     assert not is_bibd(((1, 2), (1, 2, 3)))
 
 
+def test_empty_blocks_break_bibd():
+    assert not is_bibd(((), ()))
+
+
+def test_single_element_breaks_bibd():
+    assert not is_bibd(((1,), (1,)))
+
+
+def test_repeated_element_in_block_breaks_bibd():
+    assert not is_bibd(((1, 1), (2, 2)))
+
+
+def test_indivisible_pair_count_breaks_bibd():
+    assert not is_bibd(((1, 2), (3, 4)))
+
+
 def test_incorrect_pairwise_membership_counts_breaks_isbibd():
     # This trick just appends two identical block designs but has no overlap in
     # the treatments from the appended designs. This results in a design that
@@ -59,6 +76,19 @@ def test_unequal_pairwise_memberships_breaks_isbibd():
     )
 
 
+def test_str_to_blocks():
+    assert str_to_blocks("\n012\n345\n") == (("0", "3"), ("1", "4"), ("2", "5"))
+
+
+def test_str_to_blocks_empty():
+    assert str_to_blocks("") == ()
+
+
+def test_str_to_blocks_unequal_rows():
+    with pytest.raises(ValueError):
+        str_to_blocks("\n012\n34\n")
+
+
 def test_from_bibd():
     expected = BIBDParams(
         subjects=35,
@@ -1,6 +1,8 @@
 """An implementation of the student-proposing deferred acceptance algorithm."""
+from collections import defaultdict
 from dataclasses import dataclass
 from dataclasses import field
+from typing import DefaultDict
 from typing import Dict
 from typing import Iterable
 from typing import List
@@ -11,7 +13,7 @@ import heapq
 import itertools
 
 
-@dataclass
+@dataclass(slots=True)
 class Student:
     id: int
     """Preferences of School.id, from highest priority to lowest priority."""
@@ -23,15 +25,21 @@ class Student:
         return self.id
 
 
-@dataclass
+@dataclass(slots=True)
 class School:
     id: int
     """Preferences of Student.id, from highest priority to lowest priority."""
     preferences: List[int]
     """The number of open seats at the school."""
     capacity: int
-    """A list of size at most self.capacity containing held applications."""
-    held: List[int] = field(default_factory=list)
+    """A heap of size at most self.capacity containing held applications.
+
+    Entries are (-rank, Student.id), so the lowest priority held student is
+    at the top of the heap.
+    """
+    held: List[Tuple[int, int]] = field(default_factory=list)
+    """A lookup from Student.id to its index in self.preferences."""
+    rank: Dict[int, int] = field(default_factory=dict, repr=False, compare=False)
 
 
 @dataclass
@@ -44,30 +52,23 @@ def run_round(
     students: Dict[int, Student],
     schools: Dict[int, School],
     to_apply: Iterable[Student],
-) -> Set[Student]:
-    """Run one round of deferred acceptance, returning a list of rejections."""
-    applications: Dict[int, List[int]] = {
-        id: school.held[:]
-        for (id, school) in schools.items()
-    }
-
+    rejections: Set[Student],
+) -> None:
+    """Run one round of deferred acceptance, adding rejected students to rejections."""
+    # Only schools that receive an application are touched, and each
+    # application costs O(log capacity). Attributes used per applicant are
+    # read into locals once.
+    heappush, heappushpop = heapq.heappush, heapq.heappushpop
     for student in to_apply:
-        chosen_school = schools[student.preferences[student.best_unrejected]]
-        applications[chosen_school.id].append(student.id)
-
-    new_held_students = {
-        id: heapq.nsmallest(
-            schools[id].capacity, app_ids, key=schools[id].preferences.index
-        )
-        for (id, app_ids) in applications.items()
-    }
-
-    rejections = set()
-    for (id, school) in schools.items():
-        school.held = new_held_students[id]
-        rejections |= set(applications[id]) - set(new_held_students[id])
-
-    return set(students[student_id] for student_id in rejections)
+        student_id = student.id
+        school = schools[student.preferences[student.best_unrejected]]
+        held = school.held
+        entry = (-school.rank[student_id], student_id)
+        if len(held) < school.capacity:
+            heappush(held, entry)
+        else:
+            # Evict the lowest priority of the held students and the applicant.
+            rejections.add(students[heappushpop(held, entry)[1]])
 
 
 def deferred_acceptance(
@@ -86,25 +87,29 @@ def deferred_acceptance(
     unassigned: Set[Student] = set()
     student_index = {student.id: student for student in students}
     school_index = {school.id: school for school in schools}
+    for school in school_index.values():
+        school.rank = {
+            student_id: i for (i, student_id) in enumerate(school.preferences)
+        }
 
+    # Both sets are reused across rounds rather than reallocated.
+    rejections: Set[Student] = set()
     while to_apply:
-        rejections = run_round(student_index, school_index, to_apply)
+        rejections.clear()
+        run_round(student_index, school_index, to_apply, rejections)
+        to_apply.clear()
         for student in rejections:
-            student.best_unrejected += 1
-
-        unassigned = unassigned.union(
-            {
-                student
-                for student in rejections
-                if student.best_unrejected >= len(student.preferences)
-            }
-        )
-        to_apply = rejections - unassigned
+            best_unrejected = student.best_unrejected + 1
+            student.best_unrejected = best_unrejected
+            if best_unrejected >= len(student.preferences):
+                unassigned.add(student)
+            else:
+                to_apply.add(student)
 
     return Matching(
         matches={
             student_index[student_id]: school
-            for school in schools for student_id in school.held
+            for school in schools for (_, student_id) in school.held
         },
         unassigned=unassigned,
     )
@@ -114,34 +119,42 @@ def find_unstable_pair(
     students: Iterable[Student], schools: Iterable[School], matching: Matching
 ) -> Optional[Tuple[Student, School]]:
     """Returns an unstable pair in the matching, or None if none exists."""
+    students = list(students)
+    schools = list(schools)
+    student_rank = {
+        student.id: {school_id: i for (i, school_id) in enumerate(student.preferences)}
+        for student in students
+    }
+    school_rank = {
+        school.id: {student_id: i for (i, student_id) in enumerate(school.preferences)}
+        for school in schools
+    }
+    assigned_by_school: DefaultDict[int, List[Student]] = defaultdict(list)
+    for (student, school) in matching.matches.items():
+        assigned_by_school[school.id].append(student)
 
-    def precedes(L, item1, item2):
-        return L.index(item1) < L.index(item2)
+    def precedes(rank, item1, item2):
+        # Items missing from the ranking are treated as a non-preference.
+        try:
+            return rank[item1] < rank[item2]
+        except KeyError:
+            return False
 
     def student_prefers(student, school):
         # Returns true if a student prefers the input school over their
         # assigned school
-        try:
-            return precedes(
-                student.preferences, school.id, matching.matches[student].id
-            )
-        except ValueError:
-            # If the student doesn't have the school in their list, treat as
-            # a non-preference.
-            return False
+        return precedes(
+            student_rank[student.id], school.id, matching.matches[student].id
+        )
 
     def school_prefers(school, student):
         # Returns true if a school prefers the input student over at least one
         # of their assigned students.
-        assigned_students = [
-            student for (student, sch) in matching.matches.items()
-            if sch == school
-        ]
-        student_cmps = [
-            precedes(school.preferences, student.id, assigned_student.id)
-            for assigned_student in assigned_students
-        ]
-        return any(student_cmps)
+        rank = school_rank[school.id]
+        return any(
+            precedes(rank, student.id, assigned_student.id)
+            for assigned_student in assigned_by_school[school.id]
+        )
 
     for (student, school) in itertools.product(students, schools):
         if student not in matching.unassigned:
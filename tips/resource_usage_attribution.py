@@ -4,10 +4,20 @@ from typing import List
 from typing import TypeVar
 from typing import Union
 from typing import cast
+from scipy.sparse import csc_matrix
+from scipy.sparse.linalg import splu
 import numpy
 
 EPSILON = 1e-10
 
+# Solve with a sparse factorization when fewer than this fraction of the
+# provider-to-provider usages are nonzero.
+SPARSE_DENSITY_THRESHOLD = 0.1
+
+# Below this many providers a dense solve is cheap enough that the overhead
+# of a sparse factorization does not pay off.
+SPARSE_MIN_PROVIDERS = 100
+
 # just for type clarity
 Resource = TypeVar('Resource')
 Service = TypeVar('Service')
@@ -52,51 +62,90 @@ def attribute_resource_usage(
           and a consuming Consumer (service/customer) U, and produces as output the
           fraction of the total output of P consumed by U. For a fixed P, the sum
           of the outputs of usageFn(P, U) over all users U must be at most 1.
+          If usageFn has an attribute `vectorized` set to True, it is instead
+          called once with a column array of Providers and a row array of
+          Consumers (as built by numpy.array), and must return the array of
+          usages broadcast over all pairs.
 
     Returns:
       A dict describing the attribution of each resource among the Customers.
     '''
-    # construct transitions among transient states Q
     providers = cast(List[Provider], resources) + cast(List[Provider], services)
-    consumers = cast(List[Consumer], services) + cast(List[Consumer], customers)
-    verify_proper_normalization(providers, consumers, usageFn)
+    num_providers = len(providers)
+
+    # A single sweep over all (provider, provider-or-customer) pairs, so that
+    # usageFn is called exactly once per pair. Columns are ordered as
+    # resources, services, customers.
+    targets = providers + cast(List[Provider], customers)
+    shape = (num_providers, len(targets))
+    if getattr(usageFn, 'vectorized', False):
+        usages = numpy.array(
+            numpy.broadcast_to(
+                usageFn(
+                    numpy.array(providers)[:, None],
+                    numpy.array(targets)[None, :],
+                ),
+                shape,
+            ),
+            dtype=float,
+        )
+    else:
+        usages = numpy.empty(shape)
+        for (i, a) in enumerate(providers):
+            for (j, b) in enumerate(targets):
+                usages[i, j] = usageFn(a, b)
+
+    # Resources consume nothing, so only services and customers are consumers.
+    verify_proper_normalization(providers, usages[:, len(resources):])
 
     # transition matrix for services and resources
-    Q = numpy.array(
-        [[usageFn(a, b) for b in providers] for a in providers]
-    )
+    Q = usages[:, :num_providers]
 
     # compute transition matrix to absorbing states
-    R = numpy.array(
-        [[usageFn(a, b) for b in customers] for a in providers]
-    )
+    R = usages[:, num_providers:]
 
     if not Q.any() or not R.any():
         return dict()
 
-    # invert N = (1-Q)^{-1}
-    Q_dim = len(resources) + len(services)
-    fundamental_matrix = numpy.linalg.inv(numpy.identity(Q_dim) - Q)
-    absorbing_probabilities = numpy.dot(fundamental_matrix, R)
-
+    # B = (I-Q)^{-1} R, computed by solving (I-Q) B = R rather than inverting.
+    # Real provider graphs are usually sparse, and a sparse LU factorization
+    # then avoids the cubic cost of a dense solve.
+    # Both branches raise numpy.linalg.LinAlgError when I - Q is singular.
+    if (num_providers >= SPARSE_MIN_PROVIDERS
+            and numpy.count_nonzero(Q) < SPARSE_DENSITY_THRESHOLD * Q.size):
+        try:
+            lu = splu(csc_matrix(numpy.identity(num_providers) - Q))
+        except RuntimeError as e:
+            raise numpy.linalg.LinAlgError(str(e)) from e
+        absorbing_probabilities = lu.solve(
+            numpy.ascontiguousarray(R)
+        )
+    else:
+        absorbing_probabilities = numpy.linalg.solve(
+            numpy.identity(num_providers) - Q, R
+        )
+
+    # Convert to Python floats in one call rather than element by element.
+    rows = absorbing_probabilities[:len(resources)].tolist()
     attribution_dict = {
-        resource: {
-            customer: absorbing_probabilities[i, j]
-            for (j, customer) in enumerate(customers)
-        }
-        for (i, resource) in enumerate(resources)
+        resource: dict(zip(customers, row))
+        for (resource, row) in zip(resources, rows)
     }
 
     return attribution_dict
 
 
 def verify_proper_normalization(
-    providers: List[Provider], consumers: List[Consumer], usageFn: UsageFn
+    providers: List[Provider], consumer_usages: numpy.ndarray
 ) -> None:
-    '''Confirm that the usageFn is properly normalized.'''
-    for provider in providers:
-        if abs(sum(usageFn(provider, consumer)
-                   for consumer in consumers) - 1) > EPSILON:
+    '''Confirm that the usages of each provider's output sum to 1.
+
+    Row i of consumer_usages holds the usages of providers[i] by each
+    Consumer.
+    '''
+    row_sums = consumer_usages.sum(axis=1)
+    for (provider, row_sum) in zip(providers, row_sums):
+        if abs(row_sum - 1) > EPSILON:
             raise ValueError(
                 "Input usages are not normalized for %s" % provider
             )
@@ -7,6 +7,7 @@ from hypothesis.strategies import composite
 from hypothesis.strategies import decimals
 import numpy
 
+from resource_usage_attribution import SPARSE_MIN_PROVIDERS
 from resource_usage_attribution import attribute_resource_usage
 
 RESOURCES = ['flour', 'leather']
@@ -227,6 +228,43 @@ def test_unequal_split_at_both_service_and_customer():
             ).is_close_to(expected_attribution[resource][customer], 1e-10)
 
 
+def test_vectorized_usage_fn():
+    usages = {
+        ('flour', 'miller'): 0.6,
+        ('flour', 'leathersmith'): 0.4,
+        ('leather', 'leathersmith'): 0.9,
+        ('leather', 'miller'): 0.1,
+        ('miller', 'cake'): 0.8,
+        ('miller', 'handbag'): 0.2,
+        ('leathersmith', 'handbag'): 0.7,
+        ('leathersmith', 'cake'): 0.3,
+    }
+    calls = []
+
+    def scalarUsageFn(x, y):
+        return usages.get((x, y), 0)
+
+    def usageFn(x, y):
+        calls.append((x.shape, y.shape))
+        return numpy.vectorize(scalarUsageFn, otypes=[float])(x, y)
+
+    usageFn.vectorized = True
+
+    expected_attribution = attribute_resource_usage(
+        RESOURCES, SERVICES, CUSTOMERS, scalarUsageFn
+    )
+    actual_attribution = attribute_resource_usage(
+        RESOURCES, SERVICES, CUSTOMERS, usageFn
+    )
+
+    assert_that(calls).is_equal_to([((4, 1), (1, 6))])
+    for resource in RESOURCES:
+        for customer in CUSTOMERS:
+            assert_that(actual_attribution[resource][customer]).described_as(
+                "attribution[%s][%s]" % (resource, customer)
+            ).is_close_to(expected_attribution[resource][customer], 1e-10)
+
+
 def test_many_cycles_slight_bias():
     resources = ['R_' + str(i) for i in range(5)]
     services = ['S_' + str(i) for i in range(5)]
@@ -264,6 +302,51 @@ def test_many_cycles_slight_bias():
                 ).described_as(descr).is_less_than(1.0 / 5)
 
 
+def test_sparse_chains():
+    # Each resource flows through its own chain of services to one customer,
+    # so the transition matrix is sparse.
+    n = SPARSE_MIN_PROVIDERS // 2
+    resources = ['R_' + str(i) for i in range(n)]
+    services = ['S_' + str(i) for i in range(n)]
+    customers = ['C_' + str(i) for i in range(n)]
+
+    def usageFn(x, y):
+        if x[2:] != y[2:]:
+            return 0
+        return 1 if (x[0], y[0]) in [('R', 'S'), ('S', 'C')] else 0
+
+    actual_attribution = attribute_resource_usage(
+        resources, services, customers, usageFn
+    )
+
+    for (i, resource) in enumerate(resources):
+        for (j, customer) in enumerate(customers):
+            assert_that(actual_attribution[resource][customer]).described_as(
+                "attribution[%s][%s]" % (resource, customer)
+            ).is_close_to(1 if i == j else 0, 1e-10)
+
+
+def test_sparse_singular_cycle_raises_linalg_error():
+    # As in test_sparse_chains, but S_0 and S_1 feed only each other, so
+    # their output never reaches a customer and I - Q is singular.
+    n = SPARSE_MIN_PROVIDERS // 2
+    resources = ['R_' + str(i) for i in range(n)]
+    services = ['S_' + str(i) for i in range(n)]
+    customers = ['C_' + str(i) for i in range(n)]
+    cycle = {('S_0', 'S_1'), ('S_1', 'S_0')}
+
+    def usageFn(x, y):
+        if x in ('S_0', 'S_1'):
+            return 1 if (x, y) in cycle else 0
+        if x[2:] != y[2:]:
+            return 0
+        return 1 if (x[0], y[0]) in [('R', 'S'), ('S', 'C')] else 0
+
+    assert_that(attribute_resource_usage).raises(
+        numpy.linalg.LinAlgError
+    ).when_called_with(resources, services, customers, usageFn)
+
+
 DIM = 5
 
 